@@ -11,12 +11,19 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import random
 import re
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 ATTRIBUTE_TITLES = {
     "friction": "Friction",
     "deformation": "Deformation",
@@ -24,7 +31,9 @@ ATTRIBUTE_TITLES = {
 }
 
 LEVELS = ("high", "low")
+# Reference token pattern; canonical_key uses it directly for non-ASCII names.
 LEVEL_TOKEN_RE = re.compile(r"_(?P<level>high|low)(?P<suffix>[^_\.]*)", re.IGNORECASE)
+SLUG_RE = re.compile(r"[^a-z0-9]+")
 
 
 def parse_args() -> argparse.Namespace:
@@ -67,44 +76,70 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def find_level_token(filename: str) -> Optional[Tuple[str, slice]]:
-    match = LEVEL_TOKEN_RE.search(filename)
-    if not match:
-        return None
-    level = match.group("level").lower()
-    start = match.start()
-    end = match.end()
-    return level, slice(start, end)
-
-
 def canonical_key(filename: str) -> Optional[Tuple[str, str]]:
-    result = find_level_token(filename)
-    if not result:
+    """Return (level, canonical key) for the first high/low token in filename.
+
+    Matches LEVEL_TOKEN_RE.search: the token plus any suffix up to the next
+    "_" or "." is replaced by "_{lvl}".
+    """
+    if not filename.isascii():
+        # lower() can change the length of non-ASCII text, which would shift
+        # the slice indices below.
+        match = LEVEL_TOKEN_RE.search(filename)
+        if not match:
+            return None
+        level = match.group("level").lower()
+        return level, filename[: match.start()] + "_{lvl}" + filename[match.end() :]
+    lower = filename.lower()
+    high = lower.find("_high")
+    low = lower.find("_low")
+    if high < 0 and low < 0:
         return None
-    level, token_slice = result
-    canonical = filename[: token_slice.start] + "_{lvl}" + filename[token_slice.stop :]
-    return level, canonical
+    if low < 0 or 0 <= high < low:
+        level, start = "high", high
+    else:
+        level, start = "low", low
+    end = start + len(level) + 1
+    stops = [i for i in (lower.find("_", end), lower.find(".", end)) if i >= 0]
+    end = min(stops) if stops else len(filename)
+    return level, filename[:start] + "_{lvl}" + filename[end:]
 
 
 def readable_attribute(attribute: str) -> str:
     return ATTRIBUTE_TITLES.get(attribute, attribute.replace("_", " ").title())
 
 
+@lru_cache(maxsize=None)
 def slugify(value: str) -> str:
-    slug = re.sub(r"[^a-z0-9]+", "_", value.lower())
+    slug = SLUG_RE.sub("_", value.lower())
     return slug.strip("_") or "clip"
 
 
+def relative_posix(path: Path, root_prefix: str) -> str:
+    # root_prefix is the resolved root with a trailing separator; clips found
+    # by scanning under it can skip Path.relative_to.
+    text = os.fspath(path)
+    if text.startswith(root_prefix):
+        return text[len(root_prefix) :].replace(os.sep, "/")
+    return Path(text).relative_to(root_prefix).as_posix()
+
+
 def build_pairs(attr_dir: Path) -> Dict[str, Dict[str, Path]]:
     pairs: Dict[str, Dict[str, Path]] = {}
-    for video_path in sorted(attr_dir.glob("*.mp4")):
-        result = canonical_key(video_path.name)
+    with os.scandir(attr_dir) as entries:
+        names = sorted(
+            entry.name
+            for entry in entries
+            if entry.name.endswith(".mp4") and not entry.name.startswith(".")
+        )
+    for name in names:
+        result = canonical_key(name)
         if not result:
-            print(f"[skip] No high/low token in {video_path}", file=sys.stderr)
+            print(f"[skip] No high/low token in {attr_dir / name}", file=sys.stderr)
             continue
         level, key = result
         bucket = pairs.setdefault(key, {})
-        bucket[level] = video_path
+        bucket[level] = attr_dir / name
     return pairs
 
 
@@ -114,14 +149,15 @@ def make_question(
     scenario_key: str,
     high_path: Path,
     low_path: Path,
-    root: Path,
+    root_prefix: str,
 ) -> Dict[str, object]:
     target_level = random.choice(LEVELS)
     videos = [
         ("high", high_path),
         ("low", low_path),
     ]
-    random.shuffle(videos)
+    if random.getrandbits(1):
+        videos[0], videos[1] = videos[1], videos[0]
     (video_a_level, video_a_path), (video_b_level, video_b_path) = videos
 
     attribute_label = readable_attribute(attribute)
@@ -132,8 +168,7 @@ def make_question(
     question_id = f"cf_{method}_{attribute}_{scenario_slug}_{target_level}"
 
     def to_payload(path: Path, level: str) -> Dict[str, str]:
-        rel_path = path.relative_to(root)
-        return {"src": rel_path.as_posix(), "level": level}
+        return {"src": relative_posix(path, root_prefix), "level": level}
 
     return {
         "id": question_id,
@@ -151,11 +186,20 @@ def make_question(
     }
 
 
+def write_json(data: object, path: Path) -> None:
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
+
+
 def main() -> None:
     args = parse_args()
     random.seed(args.seed)
 
     root = args.root.resolve()
+    root_prefix = os.path.join(os.fspath(root), "")
     output_path = args.output
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -164,10 +208,14 @@ def main() -> None:
     for method in args.methods:
         for attribute in args.attributes:
             attr_dir = root / method / attribute
-            if not attr_dir.is_dir():
+            try:
+                pairs = build_pairs(attr_dir)
+            except (FileNotFoundError, NotADirectoryError):
                 print(f"[warn] Missing directory: {attr_dir}", file=sys.stderr)
                 continue
-            pairs = build_pairs(attr_dir)
+            except OSError as exc:
+                print(f"[warn] Cannot read {attr_dir}: {exc.strerror}", file=sys.stderr)
+                continue
             for scenario_key, pair in pairs.items():
                 if "high" not in pair or "low" not in pair:
                     continue
@@ -177,7 +225,7 @@ def main() -> None:
                     scenario_key=scenario_key,
                     high_path=pair["high"],
                     low_path=pair["low"],
-                    root=root,
+                    root_prefix=root_prefix,
                 )
                 questions.append(question)
 
@@ -185,8 +233,7 @@ def main() -> None:
         print("No questions generated. Check your inputs.", file=sys.stderr)
         sys.exit(1)
 
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(questions, f, indent=2)
+    write_json(questions, output_path)
 
     print(f"Wrote {len(questions)} questions to {output_path}")
 
@@ -17,6 +17,11 @@ import sys
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 SCENARIO_RE = re.compile(r"(?P<base>.+)_angle_(?P<angle>\d+)$")
 
 
@@ -140,6 +145,14 @@ def make_question(
     }
 
 
+def write_json(data: object, path: Path) -> None:
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
+
+
 def main() -> None:
     args = parse_args()
     random.seed(args.seed)
@@ -182,8 +195,7 @@ def main() -> None:
 
     output_path = args.output
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as fh:
-        json.dump(questions, fh, indent=2)
+    write_json(questions, output_path)
 
     print(f"Wrote {len(questions)} questions to {output_path}")
 
@@ -11,11 +11,20 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import random
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ATTRIBUTE_LABELS = {
     "friction": "Friction",
@@ -23,7 +32,9 @@ ATTRIBUTE_LABELS = {
     "restitution": "Bounce",
 }
 
+# Reference token pattern; detect_level uses it directly for non-ASCII names.
 LEVEL_PATTERN = re.compile(r"_(?P<level>high|low)(?P<suffix>[^/]*)", re.IGNORECASE)
+SLUG_RE = re.compile(r"[^a-z0-9]+")
 
 
 def parse_args() -> argparse.Namespace:
@@ -81,113 +92,186 @@ def attribute_label(attribute: str) -> str:
     return ATTRIBUTE_LABELS.get(attribute, attribute.replace("_", " ").title())
 
 
-def detect_level(filename: str) -> Optional[Tuple[str, slice]]:
-    match = LEVEL_PATTERN.search(filename)
-    if not match:
+def detect_level(filename: str) -> Optional[Tuple[str, str]]:
+    """Return (level, canonical key) for the first _high/_low token in filename.
+
+    Matches LEVEL_PATTERN.search: the token and everything after it are
+    replaced by "_{lvl}" so HIGH and LOW variants share a key.
+    """
+    if not filename.isascii():
+        # lower() can change the length of non-ASCII text, which would shift
+        # the slice indices below.
+        match = LEVEL_PATTERN.search(filename)
+        if not match:
+            return None
+        return match.group("level").lower(), filename[: match.start()] + "_{lvl}"
+    lower = filename.lower()
+    high = lower.find("_high")
+    low = lower.find("_low")
+    if high < 0 and low < 0:
         return None
-    level = match.group("level").lower()
-    return level, slice(match.start(), match.end())
-
-
-def canonical_key(filename: str) -> Optional[str]:
-    parsed = detect_level(filename)
-    if not parsed:
-        return None
-    _, token_slice = parsed
-    return filename[: token_slice.start] + "_{lvl}" + filename[token_slice.stop :]
+    if low < 0 or 0 <= high < low:
+        return "high", filename[:high] + "_{lvl}"
+    return "low", filename[:low] + "_{lvl}"
 
 
 def collect_pairs(directory: Path) -> Dict[str, Dict[str, Path]]:
     pairs: Dict[str, Dict[str, Path]] = {}
-    for video_path in directory.glob("*.mp4"):
-        result = detect_level(video_path.name)
-        if not result:
-            continue
-        level, token_slice = result
-        canonical = (
-            video_path.name[: token_slice.start]
-            + "_{lvl}"
-            + video_path.name[token_slice.stop :]
-        )
-        slot = pairs.setdefault(canonical, {})
-        slot[level] = video_path
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(".mp4") or name.startswith("."):
+                continue
+            parsed = detect_level(name)
+            if parsed is None:
+                continue
+            level, canonical = parsed
+            pairs.setdefault(canonical, {})[level] = Path(entry.path)
     return {key: levels for key, levels in pairs.items() if {"high", "low"} <= levels.keys()}
 
 
+@lru_cache(maxsize=None)
 def slugify(text: str) -> str:
-    slug = re.sub(r"[^a-z0-9]+", "_", text.lower())
+    slug = SLUG_RE.sub("_", text.lower())
     return slug.strip("_") or "scenario"
 
 
-def clip_payload(path: Path, level: str, attr_label: str, root: Path) -> Dict[str, str]:
+def relative_posix(path: Path, root_prefix: str) -> str:
+    # root_prefix is the resolved root with a trailing separator; clips found
+    # by scanning under it can skip Path.relative_to.
+    text = os.fspath(path)
+    if text.startswith(root_prefix):
+        return text[len(root_prefix) :].replace(os.sep, "/")
+    return Path(text).relative_to(root_prefix).as_posix()
+
+
+def clip_payload(path: Path, level: str, attr_label: str, root_prefix: str) -> Dict[str, str]:
     return {
-        "src": path.relative_to(root).as_posix(),
+        "src": relative_posix(path, root_prefix),
         "level": level,
         "label": f"{level.upper()} {attr_label}",
     }
 
 
-def make_option(method: str, pair: Dict[str, Path], attr_label: str, root: Path) -> Dict[str, object]:
+def make_option(
+    method: str,
+    method_label: str,
+    pair: Dict[str, Path],
+    attr_label: str,
+    root_prefix: str,
+) -> Dict[str, object]:
     return {
         "method": method,
-        "label": method_display(method),
+        "label": method_label,
         "clips": [
-            clip_payload(pair["high"], "high", attr_label, root),
-            clip_payload(pair["low"], "low", attr_label, root),
+            clip_payload(pair["high"], "high", attr_label, root_prefix),
+            clip_payload(pair["low"], "low", attr_label, root_prefix),
         ],
     }
 
 
+def index_pairs(
+    root: Path,
+    methods: List[str],
+    attributes: List[str],
+) -> Dict[str, Dict[str, Dict[str, Dict[str, Path]]]]:
+    """Scan every existing <method>/<attribute> folder concurrently.
+
+    Returns {method: {attribute: pairs}}; missing folders are left out and
+    unreadable ones are warned about here and indexed as empty.
+    """
+    jobs = [(method, attribute) for method in methods for attribute in attributes]
+    index: Dict[str, Dict[str, Dict[str, Dict[str, Path]]]] = {method: {} for method in methods}
+    # Directory listing is I/O-bound, so threads overlap the syscalls. Missing
+    # folders surface as scandir errors rather than a separate is_dir() stat.
+    with ThreadPoolExecutor(max_workers=max(1, min(32, len(jobs)))) as pool:
+        futures = {job: pool.submit(collect_pairs, root / job[0] / job[1]) for job in jobs}
+    for (method, attribute), future in futures.items():
+        try:
+            index[method][attribute] = future.result()
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        except OSError as exc:
+            print(f"[warn] Cannot read {root / method / attribute}: {exc.strerror}", file=sys.stderr)
+            index[method][attribute] = {}
+    return index
+
+
 def generate_questions(
     root: Path,
     attributes: List[str],
     baselines: List[str],
-) -> List[Dict[str, object]]:
-    questions: List[Dict[str, object]] = []
+) -> Iterator[Dict[str, object]]:
     phys_root = root / "physpropprior"
+    root_prefix = os.path.join(os.fspath(root), "")
+    methods = list(dict.fromkeys(["physpropprior", *baselines]))
+    pair_index = index_pairs(root, methods, attributes)
+    method_labels = {method: method_display(method) for method in methods}
+    attr_labels = {attribute: attribute_label(attribute) for attribute in attributes}
 
     for attribute in attributes:
-        attr_label = attribute_label(attribute)
-        phys_dir = phys_root / attribute
-        if not phys_dir.is_dir():
+        attr_label = attr_labels[attribute]
+        phys_pairs = pair_index["physpropprior"].get(attribute)
+        if phys_pairs is None:
+            phys_dir = phys_root / attribute
             print(f"[warn] Missing PhysPropPrior directory: {phys_dir}", file=sys.stderr)
             continue
-
-        phys_pairs = collect_pairs(phys_dir)
         if not phys_pairs:
             continue
 
         for baseline in baselines:
-            baseline_dir = root / baseline / attribute
-            if not baseline_dir.is_dir():
+            baseline_pairs = pair_index[baseline].get(attribute)
+            if baseline_pairs is None:
+                baseline_dir = root / baseline / attribute
                 print(f"[warn] Skipping baseline without {attribute}: {baseline_dir}", file=sys.stderr)
                 continue
-            baseline_pairs = collect_pairs(baseline_dir)
 
-            shared_keys = set(phys_pairs.keys()) & set(baseline_pairs.keys())
+            shared_keys = phys_pairs.keys() & baseline_pairs.keys()
             for key in sorted(shared_keys):
-                phys_option = make_option("physpropprior", phys_pairs[key], attr_label, root)
-                base_option = make_option(baseline, baseline_pairs[key], attr_label, root)
+                phys_option = make_option(
+                    "physpropprior", method_labels["physpropprior"], phys_pairs[key], attr_label, root_prefix
+                )
+                base_option = make_option(
+                    baseline, method_labels[baseline], baseline_pairs[key], attr_label, root_prefix
+                )
                 options = [phys_option, base_option]
-                random.shuffle(options)
+                if random.getrandbits(1):
+                    options[0], options[1] = options[1], options[0]
                 question_id = f"ppset_{attribute}_{slugify(key)}_{baseline}"
-                questions.append(
-                    {
-                        "id": question_id,
-                        "axis": "Physical realism",
-                        "axisDetail": attr_label,
-                        "prompt": f"Which method better distinguishes HIGH vs LOW {attr_label}?",
-                        "meta": {
-                            "attribute": attribute,
-                            "scenarioKey": key,
-                            "baseline": baseline,
-                        },
-                        "optionA": options[0],
-                        "optionB": options[1],
-                    }
-                )
-
-    return questions
+                yield {
+                    "id": question_id,
+                    "axis": "Physical realism",
+                    "axisDetail": attr_label,
+                    "prompt": f"Which method better distinguishes HIGH vs LOW {attr_label}?",
+                    "meta": {
+                        "attribute": attribute,
+                        "scenarioKey": key,
+                        "baseline": baseline,
+                    },
+                    "optionA": options[0],
+                    "optionB": options[1],
+                }
+
+
+def dump_item(item: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_INDENT_2)
+    return json.dumps(item, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def write_json_stream(items: Iterable[object], path: Path) -> int:
+    """Write items as a JSON array one element at a time; returns the count.
+
+    The output is laid out exactly like a single indent=2 dump of the list.
+    """
+    count = 0
+    with path.open("wb") as fh:
+        for item in items:
+            fh.write(b",\n  " if count else b"[\n  ")
+            fh.write(dump_item(item).replace(b"\n", b"\n  "))
+            count += 1
+        fh.write(b"\n]" if count else b"[]")
+    return count
 
 
 def main() -> None:
@@ -196,15 +280,15 @@ def main() -> None:
     root = args.root.resolve()
 
     questions = generate_questions(root, args.attributes, args.baselines)
-    if not questions:
+    first = next(questions, None)
+    if first is None:
         print("No questions generated. Check data availability.", file=sys.stderr)
         sys.exit(1)
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with args.output.open("w", encoding="utf-8") as fh:
-        json.dump(questions, fh, indent=2)
+    count = write_json_stream(chain([first], questions), args.output)
 
-    print(f"Wrote {len(questions)} questions to {args.output}")
+    print(f"Wrote {count} questions to {args.output}")
 
 
 if __name__ == "__main__":
@@ -13,15 +13,27 @@ import argparse
 import json
 import random
 import sys
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 DATASET_FILES = {
   "physical_plausibility": "physical_plausibility_questions.json",
   "force_baseline": "force_baseline_questions.json",
 }
 
+CompiledFilter = Tuple[Callable[[dict], object], Callable[[object], bool]]
+
+SELECTIVITY_SAMPLE = 64
+
+# Parsed datasets keyed by (path, mtime) so repeat calls skip re-reading files.
+DATASET_CACHE: Dict[Tuple[Path, int], List[dict]] = {}
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -74,32 +86,85 @@ def parse_args() -> argparse.Namespace:
         default=42,
         help="Random seed (default: 42).",
     )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Write every pack to a single packs.jsonl ({pid, pack} per line) instead of one file per participant.",
+    )
     return parser.parse_args()
 
 
-def get_nested(data: dict, dotted_key: str):
-    parts = dotted_key.split(".")
+def walk_keys(data: dict, parts: Tuple[str, ...]):
     value = data
-    for part in parts:
-        if not isinstance(value, dict) or part not in value:
-            return None
-        value = value[part]
+    try:
+        for part in parts:
+            value = value[part]
+    except (KeyError, TypeError):
+        return None
     return value
 
 
-def matches_filters(question: dict, filters: Dict[str, object]) -> bool:
-    for key, expected in (filters or {}).items():
-        actual = get_nested(question, key) if "." in key else question.get(key)
-        if actual is None:
-            meta = question.get("meta", {})
-            actual = meta.get(key)
-        if isinstance(expected, Sequence) and not isinstance(expected, (str, bytes)):
-            if actual not in expected:
-                return False
-        else:
-            if actual != expected:
-                return False
-    return True
+def make_getter(key: str) -> Callable[[dict], object]:
+    if "." in key:
+        parts = tuple(key.split("."))
+
+        def getter(question: dict):
+            actual = walk_keys(question, parts)
+            if actual is None:
+                actual = question.get("meta", {}).get(key)
+            return actual
+
+    else:
+
+        def getter(question: dict):
+            actual = question.get(key)
+            if actual is None:
+                actual = question.get("meta", {}).get(key)
+            return actual
+
+    return getter
+
+
+def make_predicate(expected: object) -> Callable[[object], bool]:
+    if isinstance(expected, Sequence) and not isinstance(expected, (str, bytes)):
+        try:
+            allowed = frozenset(expected)
+        except TypeError:
+            # Unhashable entries (e.g. nested lists) keep plain list membership.
+            return lambda actual: actual in expected
+
+        def predicate(actual: object) -> bool:
+            try:
+                return actual in allowed
+            except TypeError:
+                return actual in expected
+
+        return predicate
+    return lambda actual: actual == expected
+
+
+def compile_filters(
+    filters: Optional[Dict[str, object]],
+    dataset: Sequence[dict] = (),
+) -> List[CompiledFilter]:
+    compiled = [(make_getter(key), make_predicate(expected)) for key, expected in (filters or {}).items()]
+    if len(compiled) < 2 or not dataset:
+        return compiled
+    # Run the most selective predicate first so matches_filters bails out
+    # early. Acceptance rates come from an evenly spaced sample of up to
+    # SELECTIVITY_SAMPLE questions, which keeps the order deterministic.
+    step = max(1, len(dataset) // SELECTIVITY_SAMPLE)
+    sample = dataset[::step][:SELECTIVITY_SAMPLE]
+
+    def acceptance(item: CompiledFilter) -> int:
+        getter, predicate = item
+        return sum(1 for q in sample if predicate(getter(q)))
+
+    return sorted(compiled, key=acceptance)
+
+
+def matches_filters(question: dict, compiled: List[CompiledFilter]) -> bool:
+    return all(predicate(getter(question)) for getter, predicate in compiled)
 
 
 def load_dataset(dataset_name: str, data_root: Path) -> List[dict]:
@@ -109,22 +174,39 @@ def load_dataset(dataset_name: str, data_root: Path) -> List[dict]:
     path = data_root / filename
     if not path.is_file():
         raise FileNotFoundError(f"Dataset {dataset_name} missing at {path}")
-    with path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    cache_key = (path.resolve(), path.stat().st_mtime_ns)
+    dataset = DATASET_CACHE.get(cache_key)
+    if dataset is None:
+        if orjson is not None:
+            dataset = orjson.loads(path.read_bytes())
+        else:
+            dataset = json.loads(path.read_text(encoding="utf-8"))
+        DATASET_CACHE[cache_key] = dataset
+    return dataset
+
+
+def filter_key(filters: Optional[Dict[str, object]]) -> str:
+    # Filters come from JSON config and may hold dicts or nested lists, so key
+    # the cache on a canonical serialization rather than the values themselves.
+    return json.dumps(filters or {}, sort_keys=True)
 
 
 def build_question_pool(fields: List[dict], data_root: Path) -> Dict[str, List[dict]]:
     cache: Dict[str, List[dict]] = {}
+    filtered: Dict[Tuple[str, str], List[dict]] = {}
     pools: Dict[str, List[dict]] = {}
     for field in fields:
         dataset_name = field["dataset"]
         if dataset_name not in cache:
             cache[dataset_name] = load_dataset(dataset_name, data_root)
-        candidates = [
-            q
-            for q in cache[dataset_name]
-            if matches_filters(q, field.get("filters", {}))
-        ]
+        filters = field.get("filters", {})
+        # Fields that share a dataset and filter set share one candidate list.
+        key = (dataset_name, filter_key(filters))
+        candidates = filtered.get(key)
+        if candidates is None:
+            compiled = compile_filters(filters, cache[dataset_name])
+            candidates = [q for q in cache[dataset_name] if matches_filters(q, compiled)]
+            filtered[key] = candidates
         if len(candidates) < field.get("questions", 2):
             raise ValueError(
                 f"Not enough questions for field '{field['id']}' "
@@ -143,20 +225,25 @@ def ensure_participants(args: argparse.Namespace) -> List[str]:
     return [f"{args.prefix}_{i:0{width}d}" for i in range(1, args.count + 1)]
 
 
-def make_question_copy(question: dict, field: dict) -> dict:
-    copy = deepcopy(question)
-    field_info = {
+def make_field_info(field: dict) -> dict:
+    return {
         "id": field["id"],
         "label": field["label"],
         "axis": field["axis"],
         "method": field["method"],
         "attribute": field["attribute"],
     }
+
+
+def make_question_copy(question: dict, field: dict, field_info: dict) -> dict:
+    # Packs are only serialized, so nested clips/options and field_info can be
+    # shared between questions; only the top level and meta are written to.
+    copy = question.copy()
     copy["field"] = field_info
     copy["fieldId"] = field["id"]
     copy["fieldLabel"] = field["label"]
     copy["dataset"] = field["dataset"]
-    copy.setdefault("meta", {})["fieldId"] = field["id"]
+    copy["meta"] = {**question.get("meta", {}), "fieldId": field["id"]}
     return copy
 
 
@@ -165,31 +252,64 @@ def assemble_pack(
     fields: List[dict],
     pools: Dict[str, List[dict]],
     questions_per_field: Optional[int],
+    rng: random.Random,
 ) -> List[dict]:
     pack: List[dict] = []
     for field in fields:
+        field_info = make_field_info(field)
         sample_size = questions_per_field or field.get("questions", 2)
         candidates = pools[field["id"]]
-        sampled = random.sample(candidates, sample_size)
-        pack.extend(make_question_copy(q, field) for q in sampled)
-    random.shuffle(pack)
+        sampled = rng.sample(candidates, sample_size)
+        pack.extend(make_question_copy(q, field, field_info) for q in sampled)
+    rng.shuffle(pack)
     return pack
 
 
+def write_json(data: object, path: Path) -> None:
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
+
+
+def json_line(data: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    # Match orjson's compact, unescaped UTF-8 output byte for byte.
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
 def main() -> None:
     args = parse_args()
-    random.seed(args.seed)
     fields = json.loads(args.config.read_text(encoding="utf-8"))
     participants = ensure_participants(args)
     pools = build_question_pool(fields, args.data_root)
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
-    for pid in participants:
-        pack = assemble_pack(pid, fields, pools, args.questions_per_field)
+
+    def build_pack(pid: str) -> List[dict]:
+        # Each participant gets their own generator seeded from (seed, pid), so
+        # packs are reproducible no matter which thread builds them.
+        rng = random.Random(f"{args.seed}:{pid}")
+        return assemble_pack(pid, fields, pools, args.questions_per_field, rng)
+
+    def write_pack(pid: str) -> Tuple[Path, int]:
+        pack = build_pack(pid)
         output_path = args.output_dir / f"{pid}.json"
-        with output_path.open("w", encoding="utf-8") as fh:
-            json.dump(pack, fh, indent=2)
-        print(f"Wrote {len(pack)} questions to {output_path}")
+        write_json(pack, output_path)
+        return output_path, len(pack)
+
+    if args.jsonl:
+        output_path = args.output_dir / "packs.jsonl"
+        with output_path.open("wb") as fh:
+            for pid in participants:
+                fh.write(json_line({"pid": pid, "pack": build_pack(pid)}))
+        print(f"Wrote {len(participants)} packs to {output_path}")
+    else:
+        with ThreadPoolExecutor() as executor:
+            for output_path, count in executor.map(write_pack, participants):
+                print(f"Wrote {count} questions to {output_path}")
 
     total_fields = sum(field.get("questions", 2) for field in fields)
     print(